@@ -1,95 +1,108 @@
-# Updated Streamlit App using flatlib with DEMO Ephemeris (Streamlit Cloud Compatible)
+# Updated Streamlit App using swisseph with built-in Moshier Ephemeris (Streamlit Cloud Compatible)
 
 import streamlit as st
 import yfinance as yf
-from flatlib.datetime import Datetime
-from flatlib.geopos import GeoPos
-from flatlib import const
-from flatlib.chart import Chart
-from flatlib import ephem
 import datetime
+import pathlib
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 
-# === Force flatlib to use DEMO ephemeris (no swisseph) === #
-ephem.set_ephem_dir('DEMO')
+import ephemeris
+
+@st.cache_resource
+def _init_ephem():
+    # One-time ephemeris setup; Streamlit re-executes this module on every
+    # widget interaction, so keep the init out of the rerun path.
+    ephemeris.init()
+    return True
+
+_init_ephem()
 
 # Constants
 DEFAULT_TIME = datetime.time(10, 0)  # 10 AM IST
-DEFAULT_LOCATION = GeoPos('28.6139', '77.2090')  # New Delhi as default location
-
-# Vimshottari Mahadasha Years
-DASHA_YEARS = {
-    'KET': 7,
-    'VEN': 20,
-    'SUN': 6,
-    'MOON': 10,
-    'MAR': 7,
-    'RAH': 18,
-    'JUP': 16,
-    'SAT': 19,
-    'MER': 17
-}
-
-DASHA_SEQUENCE = ['KET', 'VEN', 'SUN', 'MOON', 'MAR', 'RAH', 'JUP', 'SAT', 'MER']
+
+# Vimshottari Mahadasha sequence with years per lord, aligned positionally
+DASHA_SEQUENCE = ('KET', 'VEN', 'SUN', 'MOON', 'MAR', 'RAH', 'JUP', 'SAT', 'MER')
+DASHA_YEARS = (7, 20, 6, 10, 7, 18, 16, 19, 17)
+
+NAK_SIZE = 360.0 / 27.0  # degrees per nakshatra
+
+# Precomputed at import so build_dasha_periods does no per-click arithmetic:
+# PERIOD_TABLE[i, k] = days from the start of lord i's mahadasha to the end of
+# the (k+1)th period when the cycle begins at lord i (all periods full-length).
+# Whole-day lengths keep the arithmetic integer-exact and reproducible.
+DAYS_PER_LORD = np.array([round(years * 365.25) for years in DASHA_YEARS],
+                         dtype='int64')
+PERIOD_TABLE = np.array([
+    DAYS_PER_LORD[(np.arange(9) + i) % 9].cumsum() for i in range(9)
+])
+
+DASHA_DTYPE = np.dtype([('lord', 'U4'),
+                        ('start', 'datetime64[D]'),
+                        ('end', 'datetime64[D]')])
+
+CACHE_DIR = pathlib.Path('cache')
 
 # Helper functions
-def get_moon_position(date):
-    dt_str = date.strftime('%Y/%m/%d %H:%M:%S')
-    dt = Datetime(dt_str, "+05:30")
-    chart = Chart(dt, DEFAULT_LOCATION)
-    moon = chart.get(const.MOON)
-    return float(moon.lon)
-
-def get_dasha_start_index(moon_lon):
-    nakshatra_index = int(moon_lon // (360 / 27))
-    return nakshatra_index % 9
-
-def get_dasha_balance(moon_lon):
-    degrees_per_nakshatra = 360 / 27
-    pos_in_nakshatra = moon_lon % degrees_per_nakshatra
-    portion = 1 - (pos_in_nakshatra / degrees_per_nakshatra)
-    return portion
+@st.cache_data(ttl=24 * 3600, show_spinner=False, persist="disk")
+def _fetch_history(symbol, start):
+    # Parquet copy survives worker restarts, which purge st.cache_data on
+    # Streamlit Cloud; reading it back is milliseconds vs. a Yahoo fetch.
+    CACHE_DIR.mkdir(exist_ok=True)
+    path = CACHE_DIR / f"{symbol.replace('/', '_')}_{start}.parquet"
+    if path.exists():
+        return pd.read_parquet(path)
+    df = yf.download(symbol + ".NS", start=start)
+    if not df.empty:
+        df.to_parquet(path, compression='zstd')
+    return df
+
+def moon_to_dasha(moon_lon):
+    # One divmod yields both the nakshatra index and the position inside it.
+    nakshatra, pos_in_nakshatra = divmod(moon_lon, NAK_SIZE)
+    return int(nakshatra) % 9, 1.0 - pos_in_nakshatra / NAK_SIZE
 
 def build_dasha_periods(start_idx, balance, start_date):
-    periods = []
-    idx = start_idx
-    current_date = start_date
-
-    # First dasha (partial)
-    first_lord = DASHA_SEQUENCE[idx]
-    years = DASHA_YEARS[first_lord] * balance
-    delta = datetime.timedelta(days=years * 365.25)
-    next_date = current_date + delta
-    periods.append((first_lord, current_date, next_date))
-    current_date = next_date
-
-    # Next full dashas
-    for _ in range(8):
-        idx = (idx + 1) % 9
-        lord = DASHA_SEQUENCE[idx]
-        years = DASHA_YEARS[lord]
-        delta = datetime.timedelta(days=years * 365.25)
-        next_date = current_date + delta
-        periods.append((lord, current_date, next_date))
-        current_date = next_date
-
+    # Period boundaries stay datetime64 end to end — no Julian-day round
+    # trips; plotly consumes the dates as-is.
+    # The first dasha runs only for its remaining balance, which shifts every
+    # cumulative offset back by the already-elapsed part of that period.
+    elapsed = round(float(DAYS_PER_LORD[start_idx]) * (1 - balance))
+    offsets = PERIOD_TABLE[start_idx] - elapsed  # int64 days, exact
+
+    periods = np.empty(9, dtype=DASHA_DTYPE)
+    periods['lord'] = [DASHA_SEQUENCE[(start_idx + k) % 9] for k in range(9)]
+    start_np = np.datetime64(start_date, 'D')
+    periods['end'] = start_np + offsets.astype('timedelta64[D]')
+    periods['start'][0] = start_np
+    periods['start'][1:] = periods['end'][:-1]
     return periods
 
-def plot_with_dashas(df, dasha_periods):
+def plot_with_dashas(close, dasha_periods):
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df.index, y=df['Close'], mode='lines', name='Close Price'))
+    # Scattergl renders via WebGL; decades of daily bars would otherwise be
+    # inserted as individual SVG nodes browser-side.
+    fig.add_trace(go.Scattergl(x=close.index, y=close, mode='lines', name='Close Price'))
 
     colors = ['#FFCCCC','#CCFFCC','#CCCCFF','#FFCC99','#99CCFF','#FF99CC','#CCFF99','#9999FF','#FF9966']
 
-    for i, (lord, start, end) in enumerate(dasha_periods):
-        fig.add_vrect(
-            x0=start, x1=end,
-            fillcolor=colors[i % len(colors)], opacity=0.2,
-            annotation_text=lord, annotation_position="top left",
-            line_width=0
-        )
-
-    fig.update_layout(title="Stock Price with Vimshottari Mahadasha",
+    # Hand plotly all rects and labels in one layout update instead of nine
+    # add_vrect calls, each of which mutates and re-serializes the figure.
+    shapes = [
+        dict(type='rect', xref='x', yref='paper', x0=start, x1=end, y0=0, y1=1,
+             fillcolor=colors[i % len(colors)], opacity=0.2, line_width=0,
+             layer='below')
+        for i, (lord, start, end) in enumerate(dasha_periods)
+    ]
+    annotations = [
+        dict(x=start, y=1, xref='x', yref='paper', text=lord, showarrow=False,
+             xanchor='left', yanchor='top')
+        for lord, start, end in dasha_periods
+    ]
+
+    fig.update_layout(shapes=shapes, annotations=annotations,
+                      title="Stock Price with Vimshottari Mahadasha",
                       xaxis_title="Date", yaxis_title="Price")
     st.plotly_chart(fig, use_container_width=True)
 
@@ -102,19 +115,22 @@ listing_date = st.date_input("Enter Listing Date", value=datetime.date(2000, 1,
 if st.button("Calculate & Plot"):
     try:
         listing_dt = datetime.datetime.combine(listing_date, DEFAULT_TIME)
-        moon_lon = get_moon_position(listing_dt)
-        start_idx = get_dasha_start_index(moon_lon)
-        balance = get_dasha_balance(moon_lon)
+        moon_lon = ephemeris.moon_longitude(listing_dt)
+        start_idx, balance = moon_to_dasha(moon_lon)
 
         dasha_periods = build_dasha_periods(start_idx, balance, listing_dt)
 
         st.success(f"Starting Mahadasha: {DASHA_SEQUENCE[start_idx]} (Balance: {balance:.2%})")
 
-        df = yf.download(symbol + ".NS", start=listing_date.strftime('%Y-%m-%d'))
+        df = _fetch_history(symbol, listing_date.strftime('%Y-%m-%d'))
         if df.empty:
             st.warning("No stock data found. Please check the symbol and date.")
         else:
-            plot_with_dashas(df, dasha_periods)
+            # Only Close is ever plotted; slicing it out and downcasting to
+            # float32 halves the payload serialized to the browser.
+            close = df['Close'].squeeze(axis=1).astype('float32')
+            del df
+            plot_with_dashas(close, dasha_periods)
 
     except Exception as e:
         st.error(f"Error: {e}")
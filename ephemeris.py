@@ -0,0 +1,60 @@
+# Ephemeris backend for the Vimshottari dasha computation.
+#
+# Single source of truth for the swisseph access: app.py only ever needs a
+# Moon longitude for a naive IST datetime. flatlib itself wraps swisseph, so
+# there is no lighter backend to fall back to; with no ephemeris files
+# shipped, swisseph's built-in Moshier ephemeris keeps the Streamlit Cloud
+# setup working.
+
+import datetime
+import functools
+
+import swisseph as swe
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))  # no DST, ever
+
+# Only longitudes are consumed, so skip the corrections that cannot move a
+# nakshatra bucket: nutation, gravitational deflection and annual aberration.
+EPHEM_FLAGS = swe.FLG_SWIEPH | swe.FLG_NONUT | swe.FLG_NOGDEFL | swe.FLG_NOABERR
+
+def init():
+    # One-time setup; app.py calls this through st.cache_resource so it
+    # stays out of the Streamlit rerun path.
+    swe.set_ephe_path('')
+
+class EphemerisSnapshot:
+    """Graha longitudes for one Julian day, computed lazily and memoized.
+
+    Only the Moon is needed today, but Bhukti/Antara and Panchanga features
+    reuse the same instant for other grahas; each one is computed at most
+    once per snapshot.
+    """
+
+    def __init__(self, jd_ut):
+        self.jd_ut = jd_ut
+        self._cache = {}
+
+    def graha(self, planet):
+        if planet not in self._cache:
+            xx, retflag = swe.calc_ut(self.jd_ut, planet, EPHEM_FLAGS)
+            if retflag < 0:
+                raise RuntimeError(f"swisseph failed for planet {planet} "
+                                   f"at JD {self.jd_ut}")
+            self._cache[planet] = xx[0]
+        return self._cache[planet]
+
+@functools.lru_cache(maxsize=4096)
+def get_snapshot(jd_minute):
+    # Keyed on whole minutes of the Julian day so float noise in the time
+    # fraction cannot bust the cache: the Moon moves ~0.0087 deg/min against
+    # a 13.33 deg nakshatra, so sub-minute truncation is astronomically moot.
+    return EphemerisSnapshot(jd_minute / 1440.0)
+
+def to_julian_day(date):
+    ut = date.replace(tzinfo=IST).astimezone(datetime.timezone.utc)
+    return swe.julday(ut.year, ut.month, ut.day,
+                      ut.hour + ut.minute / 60 + ut.second / 3600)
+
+def moon_longitude(date):
+    """Moon longitude in degrees for a naive IST datetime."""
+    return get_snapshot(round(to_julian_day(date) * 1440)).graha(swe.MOON)